@@ -1,12 +1,23 @@
 import streamlit as st
 import numpy as np
-import pandas as pd
 import plotly.graph_objects as go
-import plotly.express as px
 from plotly.subplots import make_subplots
 import time
-import random
-from datetime import datetime, timedelta
+import hashlib
+import marshal
+
+# numba is optional. Without it the scalar path runs the NumPy model body as-is:
+# identical results, but each call costs ~80 us of per-scalar ufunc overhead (slower
+# than the compiled kernel and than plain dict lookups), so it is a correctness
+# fallback only. Array sweeps are unaffected, they always use the NumPy body.
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit that returns the function unchanged"""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
 
 # Lead flotation lookup tables
 COLLECTOR_LOOKUP = {
@@ -54,99 +65,173 @@ LUPROSET_LOOKUP = {
     500: {"carbon_rejection": 85.0, "recovery_effect": -5.0}
 }
 
-def interpolate_lookup(value, lookup_table):
-    """Interpolate between lookup table values"""
-    keys = sorted(lookup_table.keys())
-    
-    if value <= keys[0]:
-        return lookup_table[keys[0]]
-    if value >= keys[-1]:
-        return lookup_table[keys[-1]]
-    
-    # Find surrounding keys
-    for i in range(len(keys) - 1):
-        if keys[i] <= value <= keys[i + 1]:
-            lower_key, upper_key = keys[i], keys[i + 1]
-            break
-    
-    # Linear interpolation
-    weight = (value - lower_key) / (upper_key - lower_key)
-    result = {}
-    
-    for param in lookup_table[lower_key]:
-        lower_val = lookup_table[lower_key][param]
-        upper_val = lookup_table[upper_key][param]
-        result[param] = lower_val + weight * (upper_val - lower_val)
-    
-    return result
-
-def calculate_performance(collector, air_rate, smbs, ph, luproset, fe_feed_grade, carbon_feed_grade, zn_feed_grade):
-    """Calculate lead flotation performance from parameters"""
+def build_lookup_arrays(lookup_table):
+    """Convert a lookup table into sorted keys and one value row per parameter"""
+    keys = sorted(lookup_table)
+    params = list(lookup_table[keys[0]])
+    xs = np.array(keys, dtype=np.float64)
+    ys = np.array([[lookup_table[k][p] for k in keys] for p in params], dtype=np.float64)
+    # Shared by every calculation, so guard against accidental in-place edits
+    xs.setflags(write=False)
+    ys.setflags(write=False)
+    return xs, ys
+
+# Precomputed sorted key / value arrays for interpolation (shared, read-only).
+# Rebuilt on every rerun: it takes microseconds and picks up edited tables at once
+COLLECTOR_XS, COLLECTOR_YS = build_lookup_arrays(COLLECTOR_LOOKUP)
+AIR_RATE_XS, AIR_RATE_YS = build_lookup_arrays(AIR_RATE_LOOKUP)
+SMBS_XS, SMBS_YS = build_lookup_arrays(SMBS_LOOKUP)
+PH_XS, PH_YS = build_lookup_arrays(PH_LOOKUP)
+LUPROSET_XS, LUPROSET_YS = build_lookup_arrays(LUPROSET_LOOKUP)
+
+# Pinned kernel signature: 8 float parameters in, the 5 performance values out
+PERF_KERNEL_SIGNATURE = "UniTuple(float64, 5)({})".format(", ".join(["float64"] * 8))
+
+def _calc_perf_core(collector, air_rate, smbs, ph, luproset, fe_feed_grade, carbon_feed_grade, zn_feed_grade):
+    """Calculate lead flotation performance from parameters (the one definition of the model)
+
+    Written with NumPy ufuncs only, so the same body broadcasts over array inputs
+    (calculate_performance_batch) and compiles as the scalar kernel
+    (load_perf_kernel). The lookup arrays are read as globals, which Numba freezes
+    into the compiled code as constants (they are read-only, so this is safe).
+    """
     
     # Get individual effects
-    collector_metrics = interpolate_lookup(collector, COLLECTOR_LOOKUP)
-    air_metrics = interpolate_lookup(air_rate, AIR_RATE_LOOKUP)
-    smbs_metrics = interpolate_lookup(smbs, SMBS_LOOKUP)
-    ph_metrics = interpolate_lookup(ph, PH_LOOKUP)
-    luproset_metrics = interpolate_lookup(luproset, LUPROSET_LOOKUP)
+    collector_rec = np.interp(collector, COLLECTOR_XS, COLLECTOR_YS[0])
+    collector_grade = np.interp(collector, COLLECTOR_XS, COLLECTOR_YS[1])
+    collector_zn = np.interp(collector, COLLECTOR_XS, COLLECTOR_YS[2])
+    collector_fe = np.interp(collector, COLLECTOR_XS, COLLECTOR_YS[3])
+    air_rec = np.interp(air_rate, AIR_RATE_XS, AIR_RATE_YS[0])
+    air_grade = np.interp(air_rate, AIR_RATE_XS, AIR_RATE_YS[1])
+    air_zn = np.interp(air_rate, AIR_RATE_XS, AIR_RATE_YS[2])
+    air_fe = np.interp(air_rate, AIR_RATE_XS, AIR_RATE_YS[3])
+    smbs_rec = np.interp(smbs, SMBS_XS, SMBS_YS[0])
+    smbs_grade = np.interp(smbs, SMBS_XS, SMBS_YS[1])
+    smbs_iron_rejection = np.interp(smbs, SMBS_XS, SMBS_YS[2])
+    smbs_zn_depression = np.interp(smbs, SMBS_XS, SMBS_YS[3])
+    ph_rec_multiplier = np.interp(ph, PH_XS, PH_YS[0])
+    ph_grade_bonus = np.interp(ph, PH_XS, PH_YS[1])
+    ph_zn_selectivity = np.interp(ph, PH_XS, PH_YS[2])
+    luproset_carbon_rejection = np.interp(luproset, LUPROSET_XS, LUPROSET_YS[0])
+    luproset_rec_effect = np.interp(luproset, LUPROSET_XS, LUPROSET_YS[1])
     
     # Weighted combination for recovery
-    base_recovery = (collector_metrics["recovery"] * 0.55 + 
-                    air_metrics["recovery"] * 0.25 + 
-                    smbs_metrics["recovery"] * 0.20 +
+    base_recovery = (collector_rec * 0.55 + 
+                    air_rec * 0.25 + 
+                    smbs_rec * 0.20 +
                     65.0 * 0.10)
     
     # Apply pH multiplier
-    recovery = base_recovery * ph_metrics["recovery_multiplier"]
+    recovery = base_recovery * ph_rec_multiplier
     
     # Luproset slightly reduces recovery due to non-selective effects
-    recovery += luproset_metrics["recovery_effect"]
+    recovery = recovery + luproset_rec_effect
     
     # Lead grade calculation
-    base_grade = (collector_metrics["grade"] * 0.50 + 
-                 air_metrics["grade"] * 0.25 + 
-                 smbs_metrics["grade"] * 0.25 +
+    base_grade = (collector_grade * 0.50 + 
+                 air_grade * 0.25 + 
+                 smbs_grade * 0.25 +
                  52.0 * 0.10)
     
-    grade = base_grade + ph_metrics["grade_bonus"]
+    grade = base_grade + ph_grade_bonus
     
     # Iron grade in concentrate - starts from feed grade, affected by collector activation, air rate, and reduced by SMBS
-    iron_rejection_factor = smbs_metrics["iron_rejection"] / 100.0
+    iron_rejection_factor = smbs_iron_rejection / 100.0
     
     # Collector activation effect on iron (similar to zinc but slightly less aggressive)
-    collector_iron_activation = collector_metrics["fe_activation"] * fe_feed_grade * 0.15
+    collector_iron_activation = collector_fe * fe_feed_grade * 0.15
     
     # Air rate effect on iron flotation (similar to zinc but slightly less responsive)
-    air_iron_flotation = air_metrics["fe_flotation"] * fe_feed_grade
+    air_iron_flotation = air_fe * fe_feed_grade
     
     # Base iron from feed, plus collector activation, plus air flotation, minus SMBS depression
     base_iron = fe_feed_grade * (1.0 - iron_rejection_factor)
     iron_grade = base_iron + collector_iron_activation + air_iron_flotation
     
     # Carbon grade in concentrate - starts from feed grade, reduced by Luproset
-    carbon_rejection_factor = luproset_metrics["carbon_rejection"] / 100.0
-    carbon_grade = carbon_feed_grade * 4 * (1.0 - carbon_rejection_factor)
+    carbon_rejection_factor = luproset_carbon_rejection / 100.0
+    carbon_max = carbon_feed_grade * 4
+    carbon_grade = carbon_max * (1.0 - carbon_rejection_factor)
     
     # Zinc grade calculation
-    base_zn_flotation = (collector_metrics["zn_activation"] + 
-                        air_metrics["zn_flotation"]) * zn_feed_grade
+    base_zn_flotation = (collector_zn + air_zn) * zn_feed_grade
     
     # pH effect on zinc selectivity (higher pH reduces zinc flotation)
-    zn_with_ph = base_zn_flotation * ph_metrics["zn_selectivity"]
+    zn_with_ph = base_zn_flotation * ph_zn_selectivity
     
     # SMBS depression effect on zinc
-    zn_depression_factor = smbs_metrics["zn_depression"] / 100.0
+    zn_depression_factor = smbs_zn_depression / 100.0
     zinc_grade = zn_with_ph * (1.0 - zn_depression_factor)
     
-    # Constraints
-    recovery = max(0, min(100, recovery))
-    grade = max(35, min(75, grade))
-    iron_grade = max(0.1, min(fe_feed_grade * 2.5, iron_grade))
-    carbon_grade = max(0.1, min((carbon_feed_grade*4), carbon_grade))
-    zinc_grade = max(0.01, min(zn_feed_grade*2, zinc_grade))
+    # Constraints (ufuncs clamp sweep arrays element-wise; np.clip has no scalar Numba version)
+    recovery = np.maximum(0.0, np.minimum(100.0, recovery))
+    grade = np.maximum(35.0, np.minimum(75.0, grade))
+    iron_grade = np.maximum(0.1, np.minimum(fe_feed_grade * 2.5, iron_grade))
+    carbon_grade = np.maximum(0.1, np.minimum(carbon_max, carbon_grade))
+    zinc_grade = np.maximum(0.01, np.minimum(zn_feed_grade*2, zinc_grade))
     
     return recovery, grade, iron_grade, carbon_grade, zinc_grade
 
+def perf_model_fingerprint():
+    """Digest of everything compiled into the kernel: signature, code and lookup arrays"""
+    digest = hashlib.sha1(PERF_KERNEL_SIGNATURE.encode())
+    digest.update(marshal.dumps(_calc_perf_core.__code__))
+    for arr in (COLLECTOR_XS, COLLECTOR_YS, AIR_RATE_XS, AIR_RATE_YS, SMBS_XS, SMBS_YS,
+                PH_XS, PH_YS, LUPROSET_XS, LUPROSET_YS):
+        # Shape and dtype too, so a re-laid-out table with the same bytes still counts
+        digest.update(repr((arr.shape, arr.dtype.str)).encode())
+        digest.update(arr.tobytes())
+    return digest.hexdigest()
+
+# Compiled inside st.cache_resource because each script rerun re-creates module
+# level functions, and re-loading from numba's disk cache costs ~10 ms.
+# st.cache_resource only keys on this function's own source, so the model
+# fingerprint is passed in to recompile after edits to the kernel or tables
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_perf_kernel(model_fingerprint):
+    """Compile (or load from numba's disk cache) the scalar kernel once per model version"""
+    # The pinned signature compiles eagerly here, so no warm-up call is needed
+    return njit(PERF_KERNEL_SIGNATURE, cache=True)(_calc_perf_core)
+
+# Fetched once per rerun (this also compiles it at startup)
+perf_kernel = load_perf_kernel(perf_model_fingerprint())
+
+def calculate_performance(collector, air_rate, smbs, ph, luproset, fe_feed_grade, carbon_feed_grade, zn_feed_grade):
+    """Calculate lead flotation performance for a single set of parameters"""
+    return tuple(float(v) for v in perf_kernel(
+        float(collector), float(air_rate), float(smbs), float(ph), float(luproset),
+        float(fe_feed_grade), float(carbon_feed_grade), float(zn_feed_grade)))
+
+def calculate_performance_batch(collector, air_rate, smbs, ph, luproset, fe_feed_grade, carbon_feed_grade, zn_feed_grade):
+    """Calculate lead flotation performance for arrays of parameters
+
+    Any argument may be a NumPy array; inputs broadcast against each other so a
+    parameter sweep is a single call. Returns a dict of result arrays keyed by
+    metric name, each with the broadcast input shape.
+    """
+    # The uncompiled model body is plain NumPy, so arrays go through it in one pass
+    results = _calc_perf_core(
+        collector, air_rate, smbs, ph, luproset, fe_feed_grade, carbon_feed_grade, zn_feed_grade)
+    
+    # Give every result the full sweep shape, even those independent of the swept input
+    shape = np.broadcast_shapes(*(np.shape(arg) for arg in (
+        collector, air_rate, smbs, ph, luproset, fe_feed_grade, carbon_feed_grade, zn_feed_grade)))
+    return {name: np.broadcast_to(result, shape) for name, result in
+            zip(('recovery', 'grade', 'iron_grade', 'carbon_grade', 'zinc_grade'), results)}
+
+# Trending history ring buffer layout (one contiguous row per column). Values are
+# float32, ample for 1-2 decimal display and half the bytes sent to the browser;
+# timestamps are kept apart as int64 monotonic-clock nanoseconds
+TREND_COLUMNS = ['recovery', 'grade', 'iron_grade', 'carbon_grade', 'zinc_grade',
+                 'pb_zn_ratio', 'collector', 'air_rate', 'smbs', 'ph', 'luproset']
+TREND_HISTORY_SIZE = 50
+
+# Feed grade bounds (Fe, C, Zn) and size of the pre-generated variation buffer
+FEED_GRADE_MIN = np.array([8.0, 3.0, 8.0])
+FEED_GRADE_MAX = np.array([13.0, 6.0, 13.0])
+FEED_VARIATION_BUFFER_SIZE = 256
+FEED_HISTORY_SIZE = 20
+
 def update_feed_grades():
     """Update feed grades with random variation within ±15%"""
     if 'current_fe_grade' not in st.session_state:
@@ -154,154 +239,193 @@ def update_feed_grades():
         st.session_state.current_carbon_grade = 4.5
         st.session_state.current_zn_grade = 10.5
     
-    # Random variation within ±15% (scaled up by factor of 15)
-    fe_variation = random.uniform(-0.15, 0.15) * st.session_state.current_fe_grade
-    carbon_variation = random.uniform(-0.15, 0.15) * st.session_state.current_carbon_grade
-    zn_variation = random.uniform(-0.15, 0.15) * st.session_state.current_zn_grade
-    
-    # Apply variations with bounds checking
-    st.session_state.current_fe_grade = max(8.0, min(13.0, 
-        st.session_state.current_fe_grade + fe_variation))
-    st.session_state.current_carbon_grade = max(3.0, min(6.0, 
-        st.session_state.current_carbon_grade + carbon_variation))
-    st.session_state.current_zn_grade = max(8.0, min(13.0, 
-        st.session_state.current_zn_grade + zn_variation))
-
-def add_to_history(timestamp, recovery, grade, iron_grade, carbon_grade, zinc_grade, 
+    # Draw variations in batches and consume one (Fe, C, Zn) row per update
+    if st.session_state.get('feed_variation_idx', FEED_VARIATION_BUFFER_SIZE) >= FEED_VARIATION_BUFFER_SIZE:
+        if 'feed_rng' not in st.session_state:
+            st.session_state.feed_rng = np.random.default_rng()
+        st.session_state.feed_variations = st.session_state.feed_rng.uniform(
+            -0.15, 0.15, size=(FEED_VARIATION_BUFFER_SIZE, 3))
+        st.session_state.feed_variation_idx = 0
+    variation = st.session_state.feed_variations[st.session_state.feed_variation_idx]
+    st.session_state.feed_variation_idx += 1
+    
+    # Random variation within ±15%, applied with bounds checking in one step
+    current = np.array([st.session_state.current_fe_grade,
+                        st.session_state.current_carbon_grade,
+                        st.session_state.current_zn_grade])
+    updated = np.clip(current * (1.0 + variation), FEED_GRADE_MIN, FEED_GRADE_MAX)
+    (st.session_state.current_fe_grade,
+     st.session_state.current_carbon_grade,
+     st.session_state.current_zn_grade) = updated.tolist()
+
+def reset_feed_history():
+    """Allocate an empty feed condition history ring buffer (time, Fe, C, Zn)"""
+    st.session_state.feed_history = np.empty((FEED_HISTORY_SIZE, 4), dtype=np.float64)
+    st.session_state.feed_idx = 0
+    st.session_state.feed_len = 0
+
+def add_feed_sample():
+    """Record the current feed grades, overwriting the oldest sample once full"""
+    st.session_state.feed_history[st.session_state.feed_idx] = (
+        time.time(),
+        st.session_state.current_fe_grade,
+        st.session_state.current_carbon_grade,
+        st.session_state.current_zn_grade
+    )
+    st.session_state.feed_idx = (st.session_state.feed_idx + 1) % FEED_HISTORY_SIZE
+    st.session_state.feed_len = min(st.session_state.feed_len + 1, FEED_HISTORY_SIZE)
+
+def reset_trend_history():
+    """Allocate an empty trending history ring buffer (one contiguous row per column)"""
+    st.session_state.trend_times = np.zeros(TREND_HISTORY_SIZE, dtype=np.int64)
+    st.session_state.trend_buffer = np.zeros((len(TREND_COLUMNS), TREND_HISTORY_SIZE), dtype=np.float32)
+    st.session_state.trend_idx = 0
+    st.session_state.trend_len = 0
+    st.session_state.trend_last_key = None
+
+def get_trend_history():
+    """Return the trending history timestamps and columns in insertion order (oldest first)"""
+    n, idx = st.session_state.trend_len, st.session_state.trend_idx
+    times = np.roll(st.session_state.trend_times[:n], -idx)
+    values = np.roll(st.session_state.trend_buffer[:, :n], -idx, axis=1)
+    return times, values
+
+def add_to_history(timestamp_ns, recovery, grade, iron_grade, carbon_grade, zinc_grade, 
                    collector, air_rate, smbs, ph, luproset):
-    """Add current values to trending history"""
-    if 'trend_history' not in st.session_state:
-        st.session_state.trend_history = []
+    """Add current values to trending history (timestamp_ns from time.monotonic_ns())"""
+    if 'trend_buffer' not in st.session_state:
+        reset_trend_history()
     
     pb_zn_ratio = grade / zinc_grade if zinc_grade > 0 else 0
     
-    new_point = {
-        'timestamp': timestamp,
-        'recovery': recovery,
-        'grade': grade,
-        'iron_grade': iron_grade,
-        'carbon_grade': carbon_grade,
-        'zinc_grade': zinc_grade,
-        'pb_zn_ratio': pb_zn_ratio,
-        'collector': collector,
-        'air_rate': air_rate,
-        'smbs': smbs,
-        'ph': ph,
-        'luproset': luproset
-    }
-    
-    st.session_state.trend_history.append(new_point)
-    
-    # Keep only last 50 points for performance
-    if len(st.session_state.trend_history) > 50:
-        st.session_state.trend_history = st.session_state.trend_history[-50:]
+    # Overwrite the oldest point once the buffer is full (keeps the last 50 points)
+    st.session_state.trend_times[st.session_state.trend_idx] = timestamp_ns
+    st.session_state.trend_buffer[:, st.session_state.trend_idx] = (
+        recovery, grade, iron_grade, carbon_grade, zinc_grade,
+        pb_zn_ratio, collector, air_rate, smbs, ph, luproset
+    )
+    st.session_state.trend_idx = (st.session_state.trend_idx + 1) % TREND_HISTORY_SIZE
+    st.session_state.trend_len = min(st.session_state.trend_len + 1, TREND_HISTORY_SIZE)
+
+# History columns plotted by each trend figure, in trace order
+PERFORMANCE_TREND_SERIES = ('recovery', 'grade', 'zinc_grade')
+IMPURITY_TREND_SERIES = ('iron_grade', 'carbon_grade', 'ph', 'air_rate')
+
+def build_performance_figure():
+    """Build the performance trends figure with empty traces"""
+    fig1 = make_subplots(
+        rows=2, cols=2,
+        subplot_titles=('Lead Recovery (%)', 'Lead Grade (%)', 
+                       'Pb/Zn Selectivity Ratio', 'Zinc in Concentrate (%)'),
+        vertical_spacing=0.3,
+        horizontal_spacing=0.15
+    )
+    
+    # Lead Recovery
+    fig1.add_trace(
+        go.Scattergl(name='Recovery', line=dict(color='blue', width=2),
+                     mode='lines+markers', marker=dict(size=4)),
+        row=1, col=1
+    )
+    
+    # Lead Grade
+    fig1.add_trace(
+        go.Scattergl(name='Grade', line=dict(color='green', width=2),
+                     mode='lines+markers', marker=dict(size=4)),
+        row=1, col=2
+    )
+                    
+    # Zinc Grade
+    fig1.add_trace(
+        go.Scattergl(name='Zinc', line=dict(color='purple', width=2),
+                     mode='lines+markers', marker=dict(size=4)),
+        row=2, col=2
+    )
+    
+    # Update layout
+    fig1.update_layout(height=500, showlegend=False, title_text="Performance Trends")
+    fig1.update_xaxes(title_text="Time (seconds)")
+    return fig1
+
+def build_impurity_figure():
+    """Build the impurities and key parameters figure with empty traces"""
+    fig2 = make_subplots(
+        rows=2, cols=2,
+        subplot_titles=('Iron in Concentrate (%)', 'Carbon in Concentrate (%)',
+                       'pH Changes', 'Air Rate (m³/hr)'),
+        vertical_spacing=0.3,
+        horizontal_spacing=0.15
+    )
+    
+    # Iron Grade
+    fig2.add_trace(
+        go.Scattergl(name='Iron', line=dict(color='orange', width=2),
+                     mode='lines+markers', marker=dict(size=4)),
+        row=1, col=1
+    )
+    
+    # Carbon Grade
+    fig2.add_trace(
+        go.Scattergl(name='Carbon', line=dict(color='brown', width=2),
+                     mode='lines+markers', marker=dict(size=4)),
+        row=1, col=2
+    )
+    
+    # pH
+    fig2.add_trace(
+        go.Scattergl(name='pH', line=dict(color='cyan', width=2),
+                     mode='lines+markers', marker=dict(size=4)),
+        row=2, col=1
+    )
+    
+    # Air Rate
+    fig2.add_trace(
+        go.Scattergl(name='Air Rate', line=dict(color='red', width=2),
+                     mode='lines+markers', marker=dict(size=4)),
+        row=2, col=2
+    )
+    
+    # Update layout
+    fig2.update_layout(height=500, showlegend=False, title_text="Impurities & Key Parameters")
+    fig2.update_xaxes(title_text="Time (seconds)")
+    return fig2
+
+def update_trend_figure(fig, hist, series):
+    """Point each trace of a trend figure at the latest history columns"""
+    with fig.batch_update():
+        for trace, name in zip(fig.data, series):
+            trace.x = hist['time_elapsed']
+            trace.y = hist[name]
 
 def create_trending_plots():
     """Create real-time trending plots"""
-    if 'trend_history' not in st.session_state or len(st.session_state.trend_history) < 2:
+    if 'trend_buffer' not in st.session_state or st.session_state.trend_len < 2:
         st.info("📊 Adjust the parameters to start tracking changes over time...")
         return
     
-    # Convert to DataFrame
-    df = pd.DataFrame(st.session_state.trend_history)
+    # Column views into the ordered ring buffer (passed straight to plotly, no DataFrame)
+    times, history = get_trend_history()
+    hist = dict(zip(TREND_COLUMNS, history))
     
     # Create relative timestamps (seconds from start)
-    start_time = df['timestamp'].iloc[0]
-    df['time_elapsed'] = (df['timestamp'] - start_time).dt.total_seconds()
+    hist['time_elapsed'] = ((times - times[0]) / 1e9).astype(np.float32)
+    
+    # Figures are built once per session; reruns only swap in the new data
+    if 'trend_figures' not in st.session_state:
+        st.session_state.trend_figures = (build_performance_figure(), build_impurity_figure())
+    fig1, fig2 = st.session_state.trend_figures
     
     # Create two main plots
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("📈 Performance Metrics Trending")
-        
-        # Performance metrics plot
-        fig1 = make_subplots(
-            rows=2, cols=2,
-            subplot_titles=('Lead Recovery (%)', 'Lead Grade (%)', 
-                           'Pb/Zn Selectivity Ratio', 'Zinc in Concentrate (%)'),
-            vertical_spacing=0.3,
-            horizontal_spacing=0.15
-        )
-        
-        # Lead Recovery
-        fig1.add_trace(
-            go.Scatter(x=df['time_elapsed'], y=df['recovery'], 
-                      name='Recovery', line=dict(color='blue', width=2),
-                      mode='lines+markers', marker=dict(size=4)),
-            row=1, col=1
-        )
-        
-        # Lead Grade
-        fig1.add_trace(
-            go.Scatter(x=df['time_elapsed'], y=df['grade'], 
-                      name='Grade', line=dict(color='green', width=2),
-                      mode='lines+markers', marker=dict(size=4)),
-            row=1, col=2
-        )
-                        
-        # Zinc Grade
-        fig1.add_trace(
-            go.Scatter(x=df['time_elapsed'], y=df['zinc_grade'], 
-                      name='Zinc', line=dict(color='purple', width=2),
-                      mode='lines+markers', marker=dict(size=4)),
-            row=2, col=2
-        )
-        
-        # Update layout
-        fig1.update_layout(height=500, showlegend=False, title_text="Performance Trends")
-        fig1.update_xaxes(title_text="Time (seconds)")
-        
+        update_trend_figure(fig1, hist, PERFORMANCE_TREND_SERIES)
         st.plotly_chart(fig1, use_container_width=True)
     
     with col2:
         st.subheader("📉 Impurity Tracking")
-        
-        # Impurities and input parameters
-        fig2 = make_subplots(
-            rows=2, cols=2,
-            subplot_titles=('Iron in Concentrate (%)', 'Carbon in Concentrate (%)',
-                           'pH Changes', 'Air Rate (m³/hr)'),
-            vertical_spacing=0.3,
-            horizontal_spacing=0.15
-        )
-        
-        # Iron Grade
-        fig2.add_trace(
-            go.Scatter(x=df['time_elapsed'], y=df['iron_grade'], 
-                      name='Iron', line=dict(color='orange', width=2),
-                      mode='lines+markers', marker=dict(size=4)),
-            row=1, col=1
-        )
-        
-        # Carbon Grade
-        fig2.add_trace(
-            go.Scatter(x=df['time_elapsed'], y=df['carbon_grade'], 
-                      name='Carbon', line=dict(color='brown', width=2),
-                      mode='lines+markers', marker=dict(size=4)),
-            row=1, col=2
-        )
-        
-        # pH
-        fig2.add_trace(
-            go.Scatter(x=df['time_elapsed'], y=df['ph'], 
-                      name='pH', line=dict(color='cyan', width=2),
-                      mode='lines+markers', marker=dict(size=4)),
-            row=2, col=1
-        )
-        
-        # Air Rate
-        fig2.add_trace(
-            go.Scatter(x=df['time_elapsed'], y=df['air_rate'], 
-                      name='Air Rate', line=dict(color='red', width=2),
-                      mode='lines+markers', marker=dict(size=4)),
-            row=2, col=2
-        )
-        
-        # Update layout
-        fig2.update_layout(height=500, showlegend=False, title_text="Impurities & Key Parameters")
-        fig2.update_xaxes(title_text="Time (seconds)")
-        
+        update_trend_figure(fig2, hist, IMPURITY_TREND_SERIES)
         st.plotly_chart(fig2, use_container_width=True)
     
     # Summary statistics
@@ -311,39 +435,39 @@ def create_trending_plots():
     with col1:
         st.metric(
             "Avg Recovery", 
-            f"{df['recovery'].mean():.1f}%",
-            f"±{df['recovery'].std():.1f}%"
+            f"{hist['recovery'].mean():.1f}%",
+            f"±{hist['recovery'].std(ddof=1):.1f}%"
         )
     
     with col2:
         st.metric(
             "Avg Grade", 
-            f"{df['grade'].mean():.1f}%",
-            f"±{df['grade'].std():.1f}%"
+            f"{hist['grade'].mean():.1f}%",
+            f"±{hist['grade'].std(ddof=1):.1f}%"
         )
     
        
     with col4:
         st.metric(
             "Avg Iron", 
-            f"{df['iron_grade'].mean():.2f}%",
-            f"±{df['iron_grade'].std():.2f}%"
+            f"{hist['iron_grade'].mean():.2f}%",
+            f"±{hist['iron_grade'].std(ddof=1):.2f}%"
         )
     
     with col5:
         st.metric(
             "Data Points", 
-            f"{len(df)}",
-            f"Last: {df['time_elapsed'].iloc[-1]:.0f}s"
+            f"{len(times)}",
+            f"Last: {hist['time_elapsed'][-1]:.0f}s"
         )
 
 # Initialize session state
 if 'dynamic_mode' not in st.session_state:
     st.session_state.dynamic_mode = False
 if 'feed_history' not in st.session_state:
-    st.session_state.feed_history = []
-if 'trend_history' not in st.session_state:
-    st.session_state.trend_history = []
+    reset_feed_history()
+if 'trend_buffer' not in st.session_state:
+    reset_trend_history()
 
 # Streamlit App
 st.set_page_config(
@@ -371,18 +495,11 @@ with col_mode2:
     if st.session_state.dynamic_mode:
         if st.button("🔄 Update Feed Conditions"):
             update_feed_grades()
-            st.session_state.feed_history.append({
-                'time': time.time(),
-                'fe_grade': st.session_state.current_fe_grade,
-                'carbon_grade': st.session_state.current_carbon_grade,
-                'zn_grade': st.session_state.current_zn_grade
-            })
-            if len(st.session_state.feed_history) > 20:
-                st.session_state.feed_history = st.session_state.feed_history[-20:]
+            add_feed_sample()
 
 with col_mode3:
     if st.button("🗑️ Clear Trending Data"):
-        st.session_state.trend_history = []
+        reset_trend_history()
         st.rerun()
 
 # Sidebar controls
@@ -466,28 +583,16 @@ else:
 
 # Calculate current performance
 recovery, grade, iron_grade, carbon_grade, zinc_grade = calculate_performance(
-    collector, air_rate, smbs, ph, luproset, fe_feed_grade, carbon_feed_grade, zn_feed_grade
-)
+    collector, air_rate, smbs, ph, luproset, fe_feed_grade, carbon_feed_grade, zn_feed_grade)
+
+# Add to trending history (only when a parameter changes)
+# Quantized integer key: pH in tenths so float noise never registers as a change
+trend_key = (int(collector), int(air_rate), int(smbs), round(ph * 10), int(luproset))
 
-# Add to trending history (only when parameters change significantly)
-current_timestamp = datetime.now()
-should_add_point = True
-
-if st.session_state.trend_history:
-    last_point = st.session_state.trend_history[-1]
-    # Check if any parameter changed significantly
-    param_changes = [
-        abs(collector - last_point['collector']) > 4,
-        abs(air_rate - last_point['air_rate']) > 24,
-        abs(smbs - last_point['smbs']) > 9,
-        abs(ph - last_point['ph']) > 0.05,
-        abs(luproset - last_point['luproset']) > 20
-    ]
-    should_add_point = any(param_changes)
-
-if should_add_point:
-    add_to_history(current_timestamp, recovery, grade, iron_grade, carbon_grade, zinc_grade,
+if st.session_state.trend_last_key != trend_key:
+    add_to_history(time.monotonic_ns(), recovery, grade, iron_grade, carbon_grade, zinc_grade,
                    collector, air_rate, smbs, ph, luproset)
+    st.session_state.trend_last_key = trend_key
 
 # Main dashboard
 col1, col2, col3, col4, col5, col6 = st.columns(6)
@@ -563,7 +668,7 @@ with st.expander("📚 How to Use Real-Time Trending"):
 
 # Reset button
 if st.button("Reset All Data"):
-    st.session_state.feed_history = []
-    st.session_state.trend_history = []
+    reset_feed_history()
+    reset_trend_history()
     st.session_state.dynamic_mode = False
     st.rerun()
\ No newline at end of file